@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Literal
+from typing import TYPE_CHECKING, Dict, Any, List, Literal
 from dataclasses import dataclass
 import json, os
 import sys
@@ -8,7 +8,13 @@ from pathlib import Path
 src_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(src_dir))
 
-from scorer import score_invoice
+if TYPE_CHECKING:
+    import numpy as np
+
+def get_scorer_modules():
+    # Deferred: the scorer pulls in pandas/sklearn, which the email-only paths never need
+    from scorer import score_invoice, score_invoices_batch
+    return score_invoice, score_invoices_batch
 
 @dataclass
 class MatchResult:
@@ -17,39 +23,64 @@ class MatchResult:
     facts: Dict[str, Any]
     explanation: str
 
+STATUS_CODES = ("match", "partial", "mismatch")
+
 def call_matcher(invoice_id: str, po_number: str, data_dir: str, model_path: str) -> MatchResult:
+    score_invoice, _ = get_scorer_modules()
     res = score_invoice(data_dir=data_dir, model_path=model_path, invoice_id=invoice_id, po_number=po_number)
-    if not res.get("found"):
-        return MatchResult(status="partial", confidence=0.5, facts={}, explanation="No features available for this pair.")
+    return match_results_from_scores([res])[0]
+
+def call_matcher_batch(pairs: List[tuple], data_dir: str, model_path: str) -> List[MatchResult]:
+    """Score all (invoice_id, po_number) pairs in one model pass."""
+    _, score_invoices_batch = get_scorer_modules()
+    scores = score_invoices_batch(data_dir=data_dir, model_path=model_path, pairs=pairs)
+    return match_results_from_scores(scores)
+
+def classify_batch(probs: np.ndarray, amount_delta: np.ndarray, vendor_match: np.ndarray,
+                   po_missing: np.ndarray, has_grn: np.ndarray) -> tuple:
+    """Vectorized status decision over uint8 flag arrays; returns (status_code, confidence) with codes indexing STATUS_CODES."""
+    import numpy as np
+    # Determine status based on multiple factors, not just model threshold (branchless OR over 0/1 flags,
+    # accumulated in place so the cascade needs no per-step temporaries)
+    mismatch = po_missing | (1 - vendor_match)
+    mismatch |= (amount_delta > 0.01).view(np.uint8)
+    mismatch |= 1 - has_grn
     
-    # Get raw model output (probability of mismatch)
-    mismatch_prob = float(res["confidence"])
-    facts = res["facts"]
+    # Enhanced status determination with better thresholds to reduce false positives:
+    # material issues or p >= 0.8 -> mismatch (2), p >= 0.6 -> partial (1), otherwise match (0)
+    mismatch |= (probs >= 0.8).view(np.uint8)
+    status_code = mismatch << 1
+    np.maximum(status_code, (probs >= 0.6).view(np.uint8), out=status_code)
+    status_code = status_code.view(np.int8)
+    confidence = np.where(status_code == 0, 1.0 - probs, probs)
+    return status_code, confidence
+
+def match_results_from_scores(scores: List[Dict[str, Any]]) -> List[MatchResult]:
+    import numpy as np
+    found = [res for res in scores if res.get("found")]
+    all_facts = [res["facts"] for res in found]
     
-    # Determine status based on multiple factors, not just model threshold
-    has_material_issues = (
-        facts.get("po_missing", False) or
-        not facts.get("vendor_match", True) or
-        facts.get("amount_delta", 0) > 0.01 or
-        not facts.get("has_grn", True)
+    # Get raw model output (probability of mismatch)
+    status_code, confidence = classify_batch(
+        np.array([float(res["confidence"]) for res in found], dtype=float),
+        np.array([f.get("amount_delta", 0) for f in all_facts], dtype=float),
+        np.array([f.get("vendor_match", True) for f in all_facts], dtype=np.uint8),
+        np.array([f.get("po_missing", False) for f in all_facts], dtype=np.uint8),
+        np.array([f.get("has_grn", True) for f in all_facts], dtype=np.uint8),
     )
     
-    # Enhanced status determination with better thresholds to reduce false positives
-    if has_material_issues:
-        status = "mismatch"
-        confidence = mismatch_prob
-    elif mismatch_prob >= 0.8:
-        status = "mismatch"
-        confidence = mismatch_prob
-    elif mismatch_prob >= 0.6:
-        status = "partial"
-        confidence = mismatch_prob
-    else:  # Lower mismatch probability - treat as match
-        status = "match"
-        confidence = 1.0 - mismatch_prob 
-    
-    explanation = build_explanation(facts, status, confidence)
-    return MatchResult(status=status, confidence=confidence, facts=facts, explanation=explanation)
+    decided = iter(zip(all_facts, status_code, confidence))
+    results = []
+    for res in scores:
+        if not res.get("found"):
+            results.append(MatchResult(status="partial", confidence=0.5, facts={}, explanation="No features available for this pair."))
+            continue
+        facts, code, conf = next(decided)
+        status, conf = STATUS_CODES[code], float(conf)
+        explanation = build_explanation(facts, status, conf)
+        results.append(MatchResult(status=status, confidence=conf, facts=facts, explanation=explanation))
+    return results
+
 def build_explanation(facts: Dict[str, Any], status: str, confidence: float) -> str:
     """Build comprehensive explanation based on facts and model output."""
     issues = []
@@ -81,44 +112,30 @@ def build_explanation(facts: Dict[str, Any], status: str, confidence: float) ->
 
 # LLM draft email tool
 
-def draft_dispute_email(vendor_name: str, invoice_id: str, po_number: str, facts: Dict[str, Any], match_status: str) -> str:
-    """Generate context-aware dispute email based on actual issues found."""
-    
-    # Identify specific issues
-    issues = []
-    if facts.get("po_missing"):
-        issues.append("• PO reference could not be located in our system")
-    if not facts.get("vendor_match", True):
-        issues.append("• Vendor information does not match our PO records")
-    if facts.get("amount_delta", 0) > 0.01:
-        amount_delta = facts.get("amount_delta", 0)
-        issues.append(f"• Amount discrepancy of ${amount_delta:.2f} detected")
-    if not facts.get("has_grn", True):
-        issues.append("• No goods receipt (GRN) found for the referenced PO")
-    
+# (condition, text) pairs checked in order; texts are formatted with the email values below
+_EMAIL_ISSUES = (
+    (lambda v: v["po_missing"], "• PO reference could not be located in our system"),
+    (lambda v: not v["vendor_match"], "• Vendor information does not match our PO records"),
+    (lambda v: v["amount_delta"] > 0.01, "• Amount discrepancy of ${amount_delta:.2f} detected"),
+    (lambda v: not v["has_grn"], "• No goods receipt (GRN) found for the referenced PO"),
     # Add timing concerns if significant
-    days_delta = abs(facts.get("days_delta", 0))
-    if days_delta > 30:
-        issues.append(f"• Timing discrepancy: Invoice received {days_delta} days after goods receipt")
-    
-    # Choose email tone based on match status
-    if match_status == "mismatch":
-        subject_prefix = "URGENT: Invoice Discrepancy"
-        urgency_text = "We have identified significant discrepancies that require immediate attention:"
-        action_text = "Please provide corrected documentation or explanation within 5 business days. Payment is currently on hold."
-    elif match_status == "partial":
-        subject_prefix = "Review Required"
-        urgency_text = "We are reviewing your invoice and need clarification on the following items:"
-        action_text = "Please review and provide supporting documentation or confirmation within 7 business days."
-    else:
-        subject_prefix = "Clarification Requested"
-        urgency_text = "We are processing your invoice and would appreciate clarification on minor items:"
-        action_text = "Please provide any additional documentation at your convenience. This will not delay payment processing."
-    
-    # Build the email
-    issues_text = "\n".join(issues) if issues else "• General compliance review as part of our standard process"
-    
-    email_body = f"""Subject: {subject_prefix} - Invoice {invoice_id} / PO {po_number}
+    (lambda v: v["days_delta"] > 30, "• Timing discrepancy: Invoice received {days_delta} days after goods receipt"),
+)
+
+# Email tone per match status: (subject_prefix, urgency_text, action_text)
+_EMAIL_TONES = {
+    "mismatch": ("URGENT: Invoice Discrepancy",
+                 "We have identified significant discrepancies that require immediate attention:",
+                 "Please provide corrected documentation or explanation within 5 business days. Payment is currently on hold."),
+    "partial": ("Review Required",
+                "We are reviewing your invoice and need clarification on the following items:",
+                "Please review and provide supporting documentation or confirmation within 7 business days."),
+}
+_DEFAULT_EMAIL_TONE = ("Clarification Requested",
+                       "We are processing your invoice and would appreciate clarification on minor items:",
+                       "Please provide any additional documentation at your convenience. This will not delay payment processing.")
+
+_EMAIL_TEMPLATE = """Subject: {subject_prefix} - Invoice {invoice_id} / PO {po_number}
 
 Dear {vendor_name},
 
@@ -129,10 +146,10 @@ Dear {vendor_name},
 Invoice Details:
 - Invoice ID: {invoice_id}
 - PO Number: {po_number}
-- Amount Delta: ${facts.get('amount_delta', 0):.2f}
-- Vendor Match: {'Yes' if facts.get('vendor_match', True) else 'No'}
-- GRN Available: {'Yes' if facts.get('has_grn', True) else 'No'}
-- PO Status: {'Found' if not facts.get('po_missing', False) else 'Missing'}
+- Amount Delta: ${amount_delta:.2f}
+- Vendor Match: {vendor_match_text}
+- GRN Available: {has_grn_text}
+- PO Status: {po_status_text}
 
 {action_text}
 
@@ -142,10 +159,41 @@ Best regards,
 Accounts Payable Department
 Acme Manufacturing
 """
-    return email_body
+
+def draft_dispute_email(vendor_name: str, invoice_id: str, po_number: str, facts: Dict[str, Any], match_status: str) -> str:
+    """Generate context-aware dispute email based on actual issues found."""
+    values = {
+        "vendor_name": vendor_name,
+        "invoice_id": invoice_id,
+        "po_number": po_number,
+        "po_missing": facts.get("po_missing", False),
+        "vendor_match": facts.get("vendor_match", True),
+        "amount_delta": facts.get("amount_delta", 0),
+        "has_grn": facts.get("has_grn", True),
+        "days_delta": abs(facts.get("days_delta", 0)),
+    }
+    
+    # Identify specific issues
+    issues = [text.format_map(values) for applies, text in _EMAIL_ISSUES if applies(values)]
+    issues_text = "\n".join(issues) if issues else "• General compliance review as part of our standard process"
+    
+    # Choose email tone based on match status
+    subject_prefix, urgency_text, action_text = _EMAIL_TONES.get(match_status, _DEFAULT_EMAIL_TONE)
+    
+    # Build the email
+    values.update(
+        subject_prefix=subject_prefix,
+        urgency_text=urgency_text,
+        action_text=action_text,
+        issues_text=issues_text,
+        vendor_match_text="Yes" if values["vendor_match"] else "No",
+        has_grn_text="Yes" if values["has_grn"] else "No",
+        po_status_text="Found" if not values["po_missing"] else "Missing",
+    )
+    return _EMAIL_TEMPLATE.format_map(values)
 
 # ---- Guardrails ----
-ALLOWED_TOOLS = {"matcher": call_matcher, "email_drafter": draft_dispute_email}
+ALLOWED_TOOLS = {"matcher": call_matcher, "batch_matcher": call_matcher_batch, "email_drafter": draft_dispute_email}
 
 def guardrail_tool_call(tool_name: str, *args, **kwargs):
     """Enhanced guardrails with validation."""
@@ -156,6 +204,13 @@ def guardrail_tool_call(tool_name: str, *args, **kwargs):
         assert len(args) >= 4, "Matcher requires: invoice_id, po_number, data_dir, model_path"
         assert all(isinstance(arg, str) for arg in args[:4]), "All matcher args must be strings"
     
+    elif tool_name == "batch_matcher":
+        assert len(args) >= 3, "Batch matcher requires: pairs, data_dir, model_path"
+        assert isinstance(args[0], list), "Pairs must be a list of (invoice_id, po_number)"
+        assert all(isinstance(p, tuple) and len(p) == 2 and all(isinstance(x, str) for x in p) for p in args[0]), \
+            "Each pair must be a (invoice_id, po_number) tuple of strings"
+        assert all(isinstance(arg, str) for arg in args[1:3]), "data_dir and model_path must be strings"
+    
     elif tool_name == "email_drafter":
         assert len(args) >= 5, "Email drafter requires: vendor_name, invoice_id, po_number, facts, status"
         assert isinstance(args[3], dict), "Facts must be a dictionary"
@@ -179,8 +234,10 @@ def planner_node(context: Dict[str, Any]) -> Dict[str, Any]:
 def reconcile_node(context: Dict[str, Any]) -> Dict[str, Any]:
     """Perform matching and determine which invoices need email follow-up."""
     results = []
-    for t in context["tasks"]:
-        mr = guardrail_tool_call("matcher", t["invoice_id"], t["po_number"], context["data_dir"], context["model_path"])
+    tasks = context["tasks"]
+    pairs = [(t["invoice_id"], t["po_number"]) for t in tasks]
+    match_results = guardrail_tool_call("batch_matcher", pairs, context["data_dir"], context["model_path"]) if pairs else []
+    for t, mr in zip(tasks, match_results):
         t["match_result"] = mr.__dict__
         
         # Improved email trigger logic - only for actual issues
@@ -1,55 +1,114 @@
 from __future__ import annotations
-import os, sys, pandas as pd
-from typing import Dict, Any
+import os, sys, json, pandas as pd
+import numpy as np
+from scipy.special import expit
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
 from pathlib import Path
 
 src_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(src_dir))
 
-from data import load_data, normalize_types
-from features import build_links, engineer_features
+from data import load_data, normalize_types, has_pyarrow, source_signature, DATA_FILES, SOURCE_METADATA_KEY
+from features import build_links, engineer_features, downcast_features
 from model import load_model, FEATURE_COLS
 
-def score_invoice(data_dir: str, model_path: str, invoice_id: str, po_number: str) -> Dict[str, Any]:
-    """Load CSVs + model, compute features for a single (invoice_id, po_number), return score + facts."""
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found at {model_path}. Train D2 first to create matcher_model.pkl.")
-    
-    clf = load_model(model_path)
-    invoices, po_grn, mismatches = load_data(data_dir)
-    inv_agg, po = normalize_types(invoices, po_grn)
-    linked = build_links(inv_agg, po)
-    feats = engineer_features(linked)
+FEATURES_PARQUET = "features.parquet"
+FACT_COLS = ["amount_delta_abs", "vendor_match", "po_missing", "has_grn", "days_delta"]
+
+def _features_parquet_path(model_path: str) -> str:
+    # Written next to the model by the CLI training run
+    return os.path.join(os.path.dirname(model_path), FEATURES_PARQUET)
 
-    row = feats[(feats["invoice_id"] == invoice_id) & (feats["po_number"] == po_number)].copy()
-    if row.empty:
-        return {"found": False, "message": "No feature row for given (invoice_id, po_number)."}
+def _pipeline_mtime_key(data_dir: str, model_path: str) -> Tuple[float, ...]:
+    """Modification times of the model, feature cache and source CSVs, used to invalidate the pipeline cache."""
+    paths = [model_path, _features_parquet_path(model_path)] + [os.path.join(data_dir, name) for name in DATA_FILES]
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in paths)
+
+def _load_cached_features(data_dir: str, model_path: str, feature_cols) -> pd.DataFrame | None:
+    """Read the column-pruned feature table from Parquet if it was built from exactly these source CSVs."""
+    path = _features_parquet_path(model_path)
+    if not (feature_cols and has_pyarrow() and os.path.exists(path)):
+        return None
+    import pyarrow.parquet as pq
+    recorded = (pq.read_schema(path).metadata or {}).get(SOURCE_METADATA_KEY)
+    if recorded is None or json.loads(recorded) != source_signature(data_dir):
+        return None
+    columns = list(dict.fromkeys(["invoice_id", "po_number"] + list(feature_cols) + FACT_COLS))
+    return pd.read_parquet(path, columns=columns, engine="pyarrow", memory_map=True)
+
+@lru_cache(maxsize=4)
+def _load_pipeline(data_dir: str, model_path: str, mtime_key: Tuple[float, ...]):
+    """Load model + engineered features once per (data_dir, model_path, mtime) and index by pair."""
+    clf = load_model(model_path)
+    feats = _load_cached_features(data_dir, model_path, getattr(clf, '_features_used', None))
+    if feats is None:
+        invoices, po_grn, mismatches = load_data(data_dir)
+        inv_agg, po = normalize_types(invoices, po_grn)
+        linked = build_links(inv_agg, po)
+        feats = downcast_features(engineer_features(linked))
 
     if hasattr(clf, '_features_used'):
-        feature_cols = clf._features_used
+        clf._features_used = tuple(clf._features_used)
     else:
-        feature_cols = []
-        for col in FEATURE_COLS:
-            if col in feats.columns:
-                if feats[col].nunique() > 1:
-                    feature_cols.append(col)
-    
-    # Use only the selected features for prediction
-    X = row[feature_cols].astype(float).values
-    proba = float(clf.predict_proba(X)[:,1][0])
-    pred = int(proba >= 0.5)
-    status = "mismatch" if pred == 1 else "match"
-
-    facts = {
-        "amount_delta": float(row["amount_delta_abs"].iloc[0]) if "amount_delta_abs" in row else 0.0,
-        "vendor_match": bool(int(row["vendor_match"].iloc[0])) if "vendor_match" in row else True,
-        "po_missing": bool(int(row["po_missing"].iloc[0])) if "po_missing" in row else False,
-        "has_grn": bool(int(row["has_grn"].iloc[0])) if "has_grn" in row else True,
-        "days_delta": float(row["days_delta"].iloc[0]) if "days_delta" in row else 0.0,
-    }
-    return {
-        "found": True,
-        "status": status,
-        "confidence": proba,
-        "facts": facts,
-    }
+        clf._features_used = tuple(
+            col for col in FEATURE_COLS if col in feats.columns and feats[col].nunique() > 1
+        )
+
+    # A PO with several GRN rows fans the left merge out to repeated pair keys; keep the first
+    # matching row per pair so the index is unique and get_indexer can resolve every lookup
+    feats_indexed = feats.set_index(["invoice_id", "po_number"], drop=False)
+    feats_indexed = feats_indexed[~feats_indexed.index.duplicated(keep="first")].sort_index()
+    # Build the lazy MultiIndex hash engine now, inside the cached load, not on the first lookup
+    feats_indexed.index.get_indexer(feats_indexed.index[:1])
+    return clf, feats_indexed
+
+# (fact key, feature column, default when the column is absent, dtype the column is read as)
+_FACT_SPECS = (
+    ("amount_delta", "amount_delta_abs", 0.0, np.float64),
+    ("vendor_match", "vendor_match", True, bool),
+    ("po_missing", "po_missing", False, bool),
+    ("has_grn", "has_grn", True, bool),
+    ("days_delta", "days_delta", 0.0, np.float64),
+)
+
+def _facts_from_rows(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Fact dicts for every row, read column-wise as NumPy arrays instead of one Series per row."""
+    n = len(rows)
+    columns = [rows[col].to_numpy().astype(np.int64 if dtype is bool else dtype).astype(dtype).tolist()
+               if col in rows.columns else [default] * n
+               for _, col, default, dtype in _FACT_SPECS]
+    keys = [key for key, _, _, _ in _FACT_SPECS]
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+def score_invoices_batch(data_dir: str, model_path: str, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Score many (invoice_id, po_number) pairs with a single decision_function call, in input order."""
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}. Train D2 first to create matcher_model.pkl.")
+
+    clf, feats_indexed = _load_pipeline(data_dir, model_path, _pipeline_mtime_key(data_dir, model_path))
+
+    # One hash lookup per pair on the (invoice_id, po_number) index; -1 marks a missing pair
+    positions = feats_indexed.index.get_indexer(pairs) if pairs else np.empty(0, dtype=np.intp)
+    found = positions >= 0
+    scored = {}
+    if found.any():
+        rows = feats_indexed.iloc[positions[found]]
+        X = rows[list(clf._features_used)].to_numpy(dtype=np.float32, copy=False)
+        # Positive-class probability straight from the logit (no 2-column predict_proba array)
+        probas = expit(clf.decision_function(X))
+
+        present = [pair for pair, ok in zip(pairs, found) if ok]
+        for pair, proba, facts in zip(present, probas.tolist(), _facts_from_rows(rows)):
+            scored[pair] = {
+                "found": True,
+                "status": "mismatch" if proba >= 0.5 else "match",
+                "confidence": proba,
+                "facts": facts,
+            }
+    return [scored.get(pair, {"found": False, "message": "No feature row for given (invoice_id, po_number)."})
+            for pair in pairs]
+
+def score_invoice(data_dir: str, model_path: str, invoice_id: str, po_number: str) -> Dict[str, Any]:
+    """Score a single (invoice_id, po_number) from the cached pipeline, return score + facts."""
+    return score_invoices_batch(data_dir, model_path, [(invoice_id, po_number)])[0]
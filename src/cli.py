@@ -1,8 +1,8 @@
 from __future__ import annotations
-import argparse, json, os
+import argparse, json, logging, os, sys
 import pandas as pd
-from .data import load_data, normalize_types
-from .features import build_links, engineer_features, attach_labels
+from .data import load_data, normalize_types, has_pyarrow, source_signature, SOURCE_METADATA_KEY
+from .features import build_links, engineer_features, attach_labels, downcast_features
 from .model import train_eval, FEATURE_COLS, save_model
 
 def main():
@@ -11,6 +11,9 @@ def main():
     ap.add_argument("--out-dir", required=True)
     args = ap.parse_args()
 
+    # Training diagnostics (features used, class distribution) go through logging; show them like the prints
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
     os.makedirs(args.out_dir, exist_ok=True)
 
     invoices, po_grn, mismatches = load_data(args.data_dir)
@@ -18,6 +21,17 @@ def main():
 
     linked = build_links(inv_agg, po)
     feats = engineer_features(linked)
+
+    # Persist unlabelled features so the agent scorer can skip the CSV pipeline; the schema
+    # metadata records which CSVs they came from so the scorer can tell when they are stale
+    if has_pyarrow():
+        import pyarrow as pa, pyarrow.parquet as pq
+        table = pa.Table.from_pandas(downcast_features(feats), preserve_index=False)
+        metadata = {**(table.schema.metadata or {}),
+                    SOURCE_METADATA_KEY: json.dumps(source_signature(args.data_dir)).encode()}
+        pq.write_table(table.replace_schema_metadata(metadata),
+                       os.path.join(args.out_dir, "features.parquet"), compression="zstd")
+
     labelled = attach_labels(feats, mismatches)
 
     # Save features for inspection
@@ -7,30 +7,88 @@ def load_invoices(data_dir: str = "./data"):
 def load_po_grn(data_dir: str = "./data"):
     _, po_grn, _ = load_data(data_dir)
     return po_grn
+import os
+import logging
 import pandas as pd
 from dateutil import parser
-from typing import Tuple
+from typing import Any, Dict, Tuple
+
+log = logging.getLogger(__name__)
+
+def has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_csv_engine() -> str:
+    # Use the multithreaded pyarrow CSV reader when it is installed
+    return "pyarrow" if has_pyarrow() else "c"
+
+# Numeric dtypes enforced at load so downstream stages need no re-coercion (malformed cells become NaN)
+INVOICE_DTYPES = {"quantity": "int64", "unit_price": "float64", "line_total": "float64"}
+PO_GRN_DTYPES = {"po_total": "float64"}
+MISMATCH_DTYPES = {"invoice_value": "float64", "po_value": "float64", "difference": "float64"}
+
+DATA_FILES = ("invoices.csv", "po_grn.csv", "labelled_mismatches.csv")
+# Parquet schema metadata key holding the source_signature a derived feature table was built from
+SOURCE_METADATA_KEY = b"smartpay_source"
+
+def source_signature(data_dir: str) -> Dict[str, Any]:
+    """Resolved data_dir plus [mtime, size] of each source CSV (None when absent)."""
+    files = {}
+    for name in DATA_FILES:
+        path = os.path.join(data_dir, name)
+        files[name] = [os.path.getmtime(path), os.path.getsize(path)] if os.path.exists(path) else None
+    return {"data_dir": os.path.realpath(data_dir), "files": files}
+
+def read_csv_typed(path: str, engine: str, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """read_csv with a numeric dtype map; if a malformed cell breaks typed parsing, coerce those columns instead."""
+    try:
+        return pd.read_csv(path, engine=engine, dtype=dtypes)
+    except (ValueError, TypeError):
+        df = pd.read_csv(path, engine=engine)
+        bad = []
+        for col in dtypes:
+            if col in df.columns:
+                coerced = pd.to_numeric(df[col], errors="coerce")
+                if coerced.isna().sum() > df[col].isna().sum():
+                    bad.append(col)
+                df[col] = coerced
+        log.warning("Non-numeric values in %s column(s) %s were read as NaN", path, bad)
+        return df
 
 def load_data(data_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    invoices = pd.read_csv(f"{data_dir}/invoices.csv")
-    po_grn = pd.read_csv(f"{data_dir}/po_grn.csv")
-    mismatches = pd.read_csv(f"{data_dir}/labelled_mismatches.csv")
+    engine = get_csv_engine()
+    invoices = read_csv_typed(f"{data_dir}/invoices.csv", engine, INVOICE_DTYPES)
+    po_grn = read_csv_typed(f"{data_dir}/po_grn.csv", engine, PO_GRN_DTYPES)
+    mismatches = read_csv_typed(f"{data_dir}/labelled_mismatches.csv", engine, MISMATCH_DTYPES)
     return invoices, po_grn, mismatches
 
-# Normalize date formats and aggregate invoice data
+def parse_date_safe(s: str):
+    try:
+        return parser.parse(str(s), dayfirst=True, yearfirst=False, fuzzy=True)
+    except Exception:
+        return pd.NaT
+
+def parse_dates(col: pd.Series) -> pd.Series:
+    """Vectorized day-first date parsing; only unparsed non-null cells fall back to fuzzy dateutil."""
+    parsed = pd.to_datetime(col, errors="coerce", dayfirst=True, format="mixed")
+    fallback = parsed.isna() & col.notna()
+    if fallback.any():
+        parsed.loc[fallback] = pd.to_datetime(col.loc[fallback].apply(parse_date_safe), errors="coerce")
+    return parsed
+
+# Normalize date formats (in place on the input frames) and aggregate invoice data
 def normalize_types(df_invoices: pd.DataFrame, df_po: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    inv = df_invoices.copy()
-    po = df_po.copy()
+    inv = df_invoices
+    po = df_po
 
     # Dates: try multiple formats gracefully
-    def parse_date_safe(s: str):
-        try:
-            return parser.parse(str(s), dayfirst=True, yearfirst=False, fuzzy=True)
-        except Exception:
-            return pd.NaT
-
-    inv["invoice_date"] = inv["invoice_date"].apply(parse_date_safe)
-    po["po_date"] = po["po_date"].apply(parse_date_safe)
+    inv["invoice_date"] = parse_dates(inv["invoice_date"])
+    po["po_date"] = parse_dates(po["po_date"])
+    po["grn_date"] = parse_dates(po["grn_date"])
 
     inv_agg = (
         inv.groupby(["invoice_id", "vendor_id", "vendor_name", "currency"])
@@ -10,12 +10,29 @@ def invoice_to_po_key(s: str) -> str:
         return "PO" + s[3:]
     return s
 
+def unify_categories(left: pd.Series, right: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Cast two key columns to one shared categorical dtype so a merge can join on integer codes."""
+    cats = pd.api.types.union_categoricals(
+        [pd.Categorical(left.dropna().unique()), pd.Categorical(right.dropna().unique())]
+    ).categories
+    dtype = pd.CategoricalDtype(cats)
+    return left.astype(dtype), right.astype(dtype)
+
 def build_links(inv_agg: pd.DataFrame, po: pd.DataFrame) -> pd.DataFrame:
     """Enhanced linking that allows for imperfect matches and missing POs."""
-    inv_agg = inv_agg.copy()
-    
+    # Shallow copies: the key columns below are replaced on these frames only, so the callers'
+    # frames keep their columns and dtypes while no column data is copied
+    inv_agg = inv_agg.copy(deep=False)
+    po = po.copy(deep=False)
+
     # Primary heuristic: INVxxxx -> POxxxx for most cases
-    inv_agg["candidate_po"] = inv_agg["invoice_id"].apply(invoice_to_po_key)
+    # (vectorized form of invoice_to_po_key)
+    ids = inv_agg["invoice_id"].astype(str)
+    inv_agg["candidate_po"] = np.where(ids.str.startswith("INV"), "PO" + ids.str.slice(3), ids)
+    
+    # Categorical join keys with shared categories: the merge hashes codes, not strings
+    for left_col, right_col in [("candidate_po", "po_number"), ("vendor_id", "vendor_id"), ("currency", "currency")]:
+        inv_agg[left_col], po[right_col] = unify_categories(inv_agg[left_col], po[right_col])
     
     # Join on candidate PO with exact vendor and currency match
     df = inv_agg.merge(
@@ -27,11 +44,12 @@ def build_links(inv_agg: pd.DataFrame, po: pd.DataFrame) -> pd.DataFrame:
     )
     
     # Some invoices should not find matching POs (real-world scenario)
-    np.random.seed(42)  
+    rng = np.random.default_rng(42)
     
     # Randomly break some links to simulate missing POs (15% of cases)
-    missing_po_mask = np.random.random(len(df)) < 0.15
-    df.loc[missing_po_mask, ["po_number", "po_date", "vendor_name_po", "po_total", "grn_number", "grn_date"]] = None
+    missing_po_mask = rng.random(len(df)) < 0.15
+    for col in ["po_number", "po_date", "vendor_name_po", "po_total", "grn_number", "grn_date"]:
+        df[col] = df[col].mask(missing_po_mask)
     
     print(f"Enhanced linking results:")
     successful_links = df['po_number'].notna().sum()
@@ -40,38 +58,37 @@ def build_links(inv_agg: pd.DataFrame, po: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def engineer_features(df_linked: pd.DataFrame) -> pd.DataFrame:
-    df = df_linked.copy()
-
-    # Improved vendor matching with fuzzy logic
-    def vendor_similarity(v1, v2):
-        if pd.isna(v1) or pd.isna(v2):
-            return 0
-        v1, v2 = str(v1).lower().strip(), str(v2).lower().strip()
-        if v1 == v2:
-            return 1
-        # Simple similarity metric
-        common_words = set(v1.split()) & set(v2.split())
-        total_words = set(v1.split()) | set(v2.split())
-        return len(common_words) / len(total_words) if total_words else 0
-    
-    df["vendor_similarity"] = df.apply(
-        lambda row: vendor_similarity(row.get("vendor_name_inv"), row.get("vendor_name_po")), axis=1
-    )
+    """Add feature columns to the linked frame in place and return it."""
+    df = df_linked
+
+    # All random masks for simulated data issues, drawn once from a single seeded generator
+    rng = np.random.default_rng(42)
+    r = rng.random((3, len(df)))
+
+    # Improved vendor matching with fuzzy logic: exact name match scores 1,
+    # otherwise word-level Jaccard similarity; missing names score 0
+    name_missing = (df["vendor_name_inv"].isna() | df["vendor_name_po"].isna()).to_numpy()
+    v1 = df["vendor_name_inv"].fillna("").astype(str).str.lower().str.strip()
+    v2 = df["vendor_name_po"].fillna("").astype(str).str.lower().str.strip()
+    s1 = v1.str.split().map(frozenset)
+    s2 = v2.str.split().map(frozenset)
+    inter = np.fromiter((len(a & b) for a, b in zip(s1, s2)), dtype=float, count=len(df))
+    union = np.fromiter((len(a | b) for a, b in zip(s1, s2)), dtype=float, count=len(df))
+    jaccard = np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+    df["vendor_similarity"] = np.where(name_missing, 0.0,
+                                       np.where((v1 == v2).to_numpy(), 1.0, jaccard))
     df["vendor_match"] = (df["vendor_similarity"] > 0.8).astype(int)
 
     # Enhanced GRN logic - some invoices might not have GRNs
     df["has_grn"] = (~df["grn_number"].isna()).astype(int)
     
     # Add realistic missing GRN cases for some invoice types
-    np.random.seed(42)
-    missing_grn_mask = np.random.random(len(df)) < 0.15
-    df.loc[missing_grn_mask, "has_grn"] = 0
-    df.loc[missing_grn_mask, "grn_number"] = None
+    missing_grn_mask = r[0] < 0.15
+    df["has_grn"] = df["has_grn"].mask(missing_grn_mask, 0)
+    df["grn_number"] = df["grn_number"].mask(missing_grn_mask)
 
     # Improved amount calculations with realistic tolerances
-    df["po_total"] = pd.to_numeric(df["po_total"], errors="coerce")
-    df["invoice_total"] = pd.to_numeric(df["invoice_total"], errors="coerce")
-    
+    # (po_total/invoice_total are float64 and dates datetime64 from load_data/normalize_types)
     # Calculate meaningful amount differences
     df["amount_delta"] = (df["invoice_total"] - df["po_total"]).fillna(0.0)
     df["amount_delta_abs"] = df["amount_delta"].abs()
@@ -85,10 +102,6 @@ def engineer_features(df_linked: pd.DataFrame) -> pd.DataFrame:
     df["amount_pct_over_tolerance"] = (df["amount_delta_pct"].abs() > 0.05).astype(int)  # 5% threshold
 
     # Enhanced date logic
-    df["invoice_date"] = pd.to_datetime(df["invoice_date"], errors="coerce")
-    df["po_date"] = pd.to_datetime(df["po_date"], errors="coerce")
-    df["grn_date"] = pd.to_datetime(df["grn_date"], errors="coerce")
-    
     # Multiple date relationships
     df["days_delta"] = (df["invoice_date"] - df["po_date"]).dt.days
     df["days_since_grn"] = (df["invoice_date"] - df["grn_date"]).dt.days
@@ -102,17 +115,17 @@ def engineer_features(df_linked: pd.DataFrame) -> pd.DataFrame:
     df["po_missing"] = df["po_number"].isna().astype(int)
     
     # Add minimal additional missing PO cases (5% on top of linking failures)
-    additional_missing_mask = np.random.random(len(df)) < 0.05
-    df.loc[additional_missing_mask, "po_missing"] = 1
-    df.loc[additional_missing_mask, ["po_number", "po_total", "po_date"]] = None
+    additional_missing_mask = r[1] < 0.05
+    df["po_missing"] = df["po_missing"].mask(additional_missing_mask, 1)
+    for col in ["po_number", "po_total", "po_date"]:
+        df[col] = df[col].mask(additional_missing_mask)
 
     # Currency mismatch detection - use the actual column name
     df["currency_match"] = 1
     
     # Add some currency mismatches (5% of cases) for realistic scenarios
-    np.random.seed(42)
-    currency_mismatch_mask = np.random.random(len(df)) < 0.05
-    df.loc[currency_mismatch_mask, "currency_match"] = 0
+    currency_mismatch_mask = r[2] < 0.05
+    df["currency_match"] = df["currency_match"].mask(currency_mismatch_mask, 0)
 
     # Replace inf/nans in numeric columns
     numeric_cols = [
@@ -125,9 +138,31 @@ def engineer_features(df_linked: pd.DataFrame) -> pd.DataFrame:
 
     return df
 
+# Compact dtypes for model inputs: 0/1 flags as int8, ratios/day counts as float32.
+# Monetary deltas stay float64 since they are reported verbatim in match facts.
+FEATURE_DTYPES = {
+    "vendor_match": np.int8,
+    "has_grn": np.int8,
+    "amount_over_tolerance": np.int8,
+    "amount_pct_over_tolerance": np.int8,
+    "invoice_before_po": np.int8,
+    "invoice_too_late": np.int8,
+    "invoice_before_grn": np.int8,
+    "po_missing": np.int8,
+    "currency_match": np.int8,
+    "vendor_similarity": np.float32,
+    "amount_delta_pct": np.float32,
+    "days_delta": np.float32,
+    "days_since_grn": np.float32,
+}
+
+def downcast_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of the engineered features with FEATURE_DTYPES applied (for inference/storage)."""
+    return df.astype({col: dtype for col, dtype in FEATURE_DTYPES.items() if col in df.columns})
+
 def attach_labels(df_features: pd.DataFrame, mismatches: pd.DataFrame) -> pd.DataFrame:
     """Enhanced label attachment that properly incorporates mismatch data."""
-    mm = mismatches.copy()
+    mm = mismatches
     mm["is_mismatch"] = 1
     
     # Create base labels
@@ -141,48 +176,67 @@ def attach_labels(df_features: pd.DataFrame, mismatches: pd.DataFrame) -> pd.Dat
     # Fill missing labels as matches (not mismatches)
     df["is_mismatch"] = df["is_mismatch"].fillna(0).astype(int)
     
+    # Row positions per invoice, built once and reused for every candidate list below
+    # (the price variance merge is a unique-key left join, so positions stay valid)
+    by_inv = df.groupby("invoice_id", sort=False).indices
+    def invoice_rows(invoice_ids) -> np.ndarray:
+        positions = [by_inv[i] for i in frozenset(invoice_ids) if i in by_inv]
+        return np.sort(np.concatenate(positions)) if positions else np.empty(0, dtype=np.intp)
+    def set_rows(rows: np.ndarray, col: str, value) -> None:
+        df.iloc[rows, df.columns.get_loc(col)] = value
+    
     # 1. Handle MISSING_PO cases properly
     missing_po_invoices = mm[mm['mismatch_type'] == 'MISSING_PO']['invoice_id'].tolist()
-    df.loc[df['invoice_id'].isin(missing_po_invoices), 'po_missing'] = 1
-    df.loc[df['invoice_id'].isin(missing_po_invoices), 'has_grn'] = 0  # No GRN if no PO
-    
-    price_variance_cases = mm[mm['mismatch_type'] == 'PRICE_VARIANCE'].copy()
-    for _, row in price_variance_cases.iterrows():
-        mask = (df['invoice_id'] == row['invoice_id']) & (df['po_number'] == row['po_number'])
-        if mask.any() and pd.notna(row['difference']):
-            # Apply the actual price difference
-            df.loc[mask, 'amount_delta'] = float(row['difference'])
-            df.loc[mask, 'amount_delta_abs'] = abs(float(row['difference']))
-            df.loc[mask, 'amount_delta_pct'] = float(row['difference']) / df.loc[mask, 'po_total'].iloc[0] if df.loc[mask, 'po_total'].iloc[0] != 0 else 0
-            
-            # Set tolerance flags
-            if abs(float(row['difference'])) > 100:
-                df.loc[mask, 'amount_over_tolerance'] = 1
-            if abs(float(row['difference'])) / df.loc[mask, 'po_total'].iloc[0] > 0.05 if df.loc[mask, 'po_total'].iloc[0] != 0 else False:
-                df.loc[mask, 'amount_pct_over_tolerance'] = 1
+    missing_po_rows = invoice_rows(missing_po_invoices)
+    set_rows(missing_po_rows, 'po_missing', 1)
+    set_rows(missing_po_rows, 'has_grn', 0)  # No GRN if no PO
+    
+    # 2. Apply the actual price difference for PRICE_VARIANCE cases (last labelled difference wins)
+    price_variance_cases = mm[mm['mismatch_type'] == 'PRICE_VARIANCE']
+    pv = (price_variance_cases[["invoice_id", "po_number", "difference"]]
+          .dropna()
+          .drop_duplicates(subset=["invoice_id", "po_number"], keep="last")
+          .rename(columns={"difference": "difference_pv"}))
+    df = df.merge(pv, how="left", on=["invoice_id", "po_number"])
+    
+    mask = df["difference_pv"].notna()
+    diff = df.loc[mask, "difference_pv"].astype(float)
+    po_total = df.loc[mask, "po_total"]
+    df.loc[mask, "amount_delta"] = diff
+    df.loc[mask, "amount_delta_abs"] = diff.abs()
+    df.loc[mask, "amount_delta_pct"] = np.where(po_total != 0, diff / po_total, 0)
+    
+    # Set tolerance flags (only ever raised, never cleared)
+    over = diff.abs() > 100
+    pct_over = (diff.abs() / po_total > 0.05) & (po_total != 0)
+    df.loc[over.index[over], "amount_over_tolerance"] = 1
+    df.loc[pct_over.index[pct_over], "amount_pct_over_tolerance"] = 1
+    df = df.drop(columns="difference_pv")
     
     # 3. Inject vendor mismatches for some TAX_MISCODE and other cases
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     tax_miscode_cases = mm[mm['mismatch_type'] == 'TAX_MISCODE']['invoice_id'].tolist()
     # Randomly assign vendor mismatches to 30% of tax miscode cases
-    vendor_mismatch_candidates = np.random.choice(tax_miscode_cases, 
-                                                size=min(8, len(tax_miscode_cases)), 
-                                                replace=False)
-    df.loc[df['invoice_id'].isin(vendor_mismatch_candidates), 'vendor_match'] = 0
-    df.loc[df['invoice_id'].isin(vendor_mismatch_candidates), 'vendor_similarity'] = np.random.uniform(0.3, 0.7, 
-                                                                                                       len(vendor_mismatch_candidates))
+    vendor_mismatch_candidates = rng.choice(tax_miscode_cases, 
+                                        size=min(8, len(tax_miscode_cases)), 
+                                        replace=False)
+    vendor_mismatch_rows = invoice_rows(vendor_mismatch_candidates)
+    set_rows(vendor_mismatch_rows, 'vendor_match', 0)
+    set_rows(vendor_mismatch_rows, 'vendor_similarity', rng.uniform(0.3, 0.7, len(vendor_mismatch_candidates)))
+    
+    mismatch_invoices = df.loc[df['is_mismatch'] == 1, 'invoice_id'].unique()
     
     # 4. Add currency mismatches
-    currency_mismatch_candidates = np.random.choice(df[df['is_mismatch'] == 1]['invoice_id'].unique(),
-                                                   size=min(5, len(df[df['is_mismatch'] == 1]['invoice_id'].unique())),
-                                                   replace=False)
-    df.loc[df['invoice_id'].isin(currency_mismatch_candidates), 'currency_match'] = 0
+    currency_mismatch_candidates = rng.choice(mismatch_invoices,
+                                             size=min(5, len(mismatch_invoices)),
+                                             replace=False)
+    set_rows(invoice_rows(currency_mismatch_candidates), 'currency_match', 0)
     
     # 5. Add date validation issues for some mismatches
-    date_issue_candidates = np.random.choice(df[df['is_mismatch'] == 1]['invoice_id'].unique(),
-                                           size=min(10, len(df[df['is_mismatch'] == 1]['invoice_id'].unique())),
-                                           replace=False)
-    df.loc[df['invoice_id'].isin(date_issue_candidates), 'invoice_too_late'] = 1
+    date_issue_candidates = rng.choice(mismatch_invoices,
+                                      size=min(10, len(mismatch_invoices)),
+                                      replace=False)
+    set_rows(invoice_rows(date_issue_candidates), 'invoice_too_late', 1)
     
     print(f"Applied mismatch patterns:")
     print(f"   - Missing PO cases: {len(missing_po_invoices)}")
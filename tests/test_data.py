@@ -0,0 +1,47 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.data import load_data  # noqa: E402
+
+
+class LoadDataTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        shutil.copytree(ROOT / "data", self.tmp, dirs_exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_clean_files_load_typed(self):
+        invoices, po_grn, mismatches = load_data(str(self.tmp))
+        self.assertEqual(invoices["quantity"].dtype, np.int64)
+        self.assertEqual(invoices["unit_price"].dtype, np.float64)
+        self.assertEqual(po_grn["po_total"].dtype, np.float64)
+        self.assertEqual(mismatches["difference"].dtype, np.float64)
+
+    def test_malformed_numeric_cell_becomes_nan(self):
+        invoices = pd.read_csv(self.tmp / "invoices.csv", dtype=str)
+        invoices.loc[0, "unit_price"] = "n/a"
+        invoices.loc[1, "quantity"] = "7 pcs"
+        invoices.to_csv(self.tmp / "invoices.csv", index=False)
+
+        with self.assertLogs("src.data", level="WARNING"):
+            loaded, _, _ = load_data(str(self.tmp))
+
+        self.assertTrue(np.isnan(loaded.loc[0, "unit_price"]))
+        self.assertTrue(np.isnan(loaded.loc[1, "quantity"]))
+        self.assertEqual(loaded["unit_price"].dtype, np.float64)
+        self.assertEqual(loaded["line_total"].notna().sum(), len(loaded))
+
+
+if __name__ == "__main__":
+    unittest.main()
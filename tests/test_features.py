@@ -0,0 +1,31 @@
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.data import load_data, normalize_types  # noqa: E402
+from src.features import build_links, engineer_features, attach_labels  # noqa: E402
+
+
+class InputFramesTest(unittest.TestCase):
+    def setUp(self):
+        invoices, po_grn, self.mismatches = load_data(str(ROOT / "data"))
+        self.inv_agg, self.po = normalize_types(invoices, po_grn)
+
+    def test_build_links_leaves_caller_frames_alone(self):
+        inv_dtypes, po_dtypes = self.inv_agg.dtypes.copy(), self.po.dtypes.copy()
+        build_links(self.inv_agg, self.po)
+        self.assertTrue(self.inv_agg.dtypes.equals(inv_dtypes))
+        self.assertTrue(self.po.dtypes.equals(po_dtypes))
+
+    def test_attach_labels_leaves_features_alone(self):
+        feats = engineer_features(build_links(self.inv_agg, self.po))
+        snapshot = feats.copy()
+        attach_labels(feats, self.mismatches)
+        self.assertTrue(feats.equals(snapshot))
+
+
+if __name__ == "__main__":
+    unittest.main()
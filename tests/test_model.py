@@ -0,0 +1,103 @@
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import model  # noqa: E402
+from src.data import load_data, normalize_types  # noqa: E402
+from src.features import build_links, engineer_features, attach_labels  # noqa: E402
+
+
+class FakeSklearnexLogisticRegression(LogisticRegression):
+    fits = 0
+
+    def fit(self, *args, **kwargs):
+        type(self).fits += 1
+        return super().fit(*args, **kwargs)
+
+
+def labelled_features():
+    invoices, po_grn, mismatches = load_data(str(ROOT / "data"))
+    inv_agg, po = normalize_types(invoices, po_grn)
+    return attach_labels(engineer_features(build_links(inv_agg, po)), mismatches)
+
+
+class SklearnexModelTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        fake_linear_model = types.ModuleType("sklearnex.linear_model")
+        fake_linear_model.LogisticRegression = FakeSklearnexLogisticRegression
+        fake_sklearnex = types.ModuleType("sklearnex")
+        fake_sklearnex.linear_model = fake_linear_model
+        self.modules = mock.patch.dict(sys.modules, {"sklearnex": fake_sklearnex,
+                                                     "sklearnex.linear_model": fake_linear_model})
+        self.modules.start()
+        model.get_sklearn_modules.cache_clear()
+
+    def tearDown(self):
+        self.modules.stop()
+        model.get_sklearn_modules.cache_clear()
+        shutil.rmtree(self.tmp)
+
+    def test_pickled_model_is_stock_sklearn(self):
+        _, clf = model.train_eval(labelled_features())
+        path = str(self.tmp / "matcher_model.pkl")
+        model.save_model(clf, path)
+
+        self.assertEqual(FakeSklearnexLogisticRegression.fits, 1)
+        self.assertIs(type(model.load_model(path)), LogisticRegression)
+        import sklearn.linear_model
+        self.assertIs(sklearn.linear_model.LogisticRegression, LogisticRegression)
+
+
+
+class SaveModelTest(unittest.TestCase):
+    def test_save_stores_float32_without_touching_caller(self):
+        _, clf = model.train_eval(labelled_features())
+        coef, intercept = clf.coef_.copy(), clf.intercept_.copy()
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            path = str(tmp / "matcher_model.pkl")
+            model.save_model(clf, path)
+            loaded = model.load_model(path)
+        finally:
+            shutil.rmtree(tmp)
+
+        self.assertEqual(clf.coef_.dtype, np.float64)
+        np.testing.assert_array_equal(clf.coef_, coef)
+        np.testing.assert_array_equal(clf.intercept_, intercept)
+        self.assertEqual(loaded.coef_.dtype, np.float32)
+        self.assertEqual(loaded.intercept_.dtype, np.float32)
+        self.assertEqual(loaded._features_used, clf._features_used)
+
+
+class WarmStartTest(unittest.TestCase):
+    def test_refit_from_previous_model(self):
+        df = labelled_features()
+        cold_metrics, cold = model.train_eval(df)
+        warm_metrics, warm = model.train_eval(df, warm_start=cold)
+
+        self.assertFalse(warm.get_params()["warm_start"])
+        self.assertEqual(warm.get_params()["max_iter"], 500)
+        self.assertLessEqual(warm.n_iter_[0], cold.n_iter_[0])
+        self.assertEqual(warm_metrics["report"], cold_metrics["report"])
+
+    def test_other_features_fit_from_scratch(self):
+        df = labelled_features()
+        _, cold = model.train_eval(df)
+        _, reduced = model.train_eval(df.drop(columns="vendor_similarity"), warm_start=cold)
+        self.assertNotIn("vendor_similarity", reduced._features_used)
+        self.assertEqual(reduced.n_features_in_, len(reduced._features_used))
+
+
+if __name__ == "__main__":
+    unittest.main()
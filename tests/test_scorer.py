@@ -0,0 +1,61 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "agent"))
+
+import scorer  # noqa: E402  (puts src/ on sys.path for the pipeline modules)
+from data import load_data, normalize_types  # noqa: E402
+from features import build_links, engineer_features, attach_labels  # noqa: E402
+from model import train_eval, save_model  # noqa: E402
+
+
+class DuplicatePairKeysTest(unittest.TestCase):
+    """A PO with a second GRN row fans the merge out to repeated (invoice_id, po_number) keys."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.data_dir = self.tmp / "data"
+        shutil.copytree(ROOT / "data", self.data_dir)
+        po = pd.read_csv(self.data_dir / "po_grn.csv")
+        extra_grn = po.head(30).assign(grn_number=lambda d: d["grn_number"] + "B")
+        pd.concat([po, extra_grn], ignore_index=True).to_csv(self.data_dir / "po_grn.csv", index=False)
+
+        # Train on the shipped data, then score the fanned-out copy
+        _, clf = train_eval(attach_labels(self.build_features(ROOT / "data"), load_data(str(ROOT / "data"))[2]))
+        self.feats = self.build_features(self.data_dir)
+        self.model_path = str(self.tmp / "model" / "matcher_model.pkl")
+        Path(self.model_path).parent.mkdir()
+        save_model(clf, self.model_path)
+        scorer._load_pipeline.cache_clear()
+
+    @staticmethod
+    def build_features(data_dir: Path) -> pd.DataFrame:
+        invoices, po_grn, _ = load_data(str(data_dir))
+        inv_agg, po = normalize_types(invoices, po_grn)
+        return engineer_features(build_links(inv_agg, po))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_every_pair_scores_from_its_first_row(self):
+        keys = self.feats[["invoice_id", "po_number"]].dropna().astype(str)
+        self.assertTrue(keys.duplicated().any())
+        pairs = list(dict.fromkeys(map(tuple, keys.to_numpy())))
+
+        results = scorer.score_invoices_batch(str(self.data_dir), self.model_path, pairs)
+
+        self.assertEqual(len(results), len(pairs))
+        self.assertTrue(all(res["found"] for res in results))
+        first_rows = self.feats.drop_duplicates(["invoice_id", "po_number"]).set_index(["invoice_id", "po_number"])
+        for pair, res in zip(pairs, results):
+            self.assertAlmostEqual(res["facts"]["amount_delta"], float(first_rows.loc[pair, "amount_delta_abs"]), places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()